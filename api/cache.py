@@ -0,0 +1,143 @@
+# api/cache.py
+
+import gzip
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import brotli
+
+# Límite de memoria de la caché (por worker) y tamaño mínimo para comprimir.
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get("BOOKAPP_RESPONSE_CACHE_BYTES", 32 * 1024 * 1024))
+MIN_COMPRESS_SIZE = 512
+
+# Costo fijo estimado por entrada (clave, diccionario de variantes, objetos bytes
+# y nodo del LRU) y tope de entradas, para que muchas respuestas diminutas no
+# desborden la memoria aunque sus cuerpos sumen poco.
+ENTRY_OVERHEAD_BYTES = 1024
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("BOOKAPP_RESPONSE_CACHE_ENTRIES", 4096))
+
+# Codificaciones en orden de preferencia cuando el cliente acepta varias.
+ENCODINGS = ("br", "gzip", "identity")
+
+class ResponseCache:
+    """
+    Caché LRU de respuestas ya serializadas, con variantes precomprimidas en
+    gzip y brotli. Las entradas se indexan por consulta y se validan contra la
+    versión del catálogo: cuando una escritura la incrementa, las entradas
+    anteriores se descartan en la siguiente consulta.
+    """
+
+    def __init__(self, max_bytes: int = RESPONSE_CACHE_MAX_BYTES, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.size = 0
+        self._version = None
+        self._entries: "OrderedDict[Hashable, Dict[str, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def clear(self):
+        """Vacía la caché."""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def get_or_build(
+        self,
+        key: Hashable,
+        version: int,
+        build: Callable[[], Any],
+        cacheable: Optional[Callable[[Any], bool]] = None,
+    ) -> Dict[str, bytes]:
+        """
+        Devuelve las variantes codificadas de `key`, construyéndolas si no están.
+        Si se indica `cacheable`, el contenido construido solo se guarda cuando
+        el predicado lo acepta (p. ej. para no retener consultas vacías).
+        """
+        with self._lock:
+            # Una consulta que empezó antes de la última escritura no se guarda
+            stale = self._version is not None and version < self._version
+            if not stale and version != self._version:
+                self._entries.clear()
+                self.size = 0
+                self._version = version
+            variants = None if stale else self._entries.get(key)
+            if variants is not None:
+                self._entries.move_to_end(key)
+                return variants
+
+        # Se serializa y comprime fuera del bloqueo para no frenar otras consultas.
+        content = build()
+        variants = _encode(content)
+        if cacheable is not None and not cacheable(content):
+            return variants
+        entry_size = _entry_size(variants)
+        with self._lock:
+            if version == self._version and entry_size <= self.max_bytes and key not in self._entries:
+                self._entries[key] = variants
+                self.size += entry_size
+                while self.size > self.max_bytes or len(self._entries) > self.max_entries:
+                    _, evicted = self._entries.popitem(last=False)
+                    self.size -= _entry_size(evicted)
+        return variants
+
+def _entry_size(variants: Dict[str, bytes]) -> int:
+    """Memoria contabilizada para una entrada: cuerpos más el costo fijo."""
+    return ENTRY_OVERHEAD_BYTES + sum(len(body) for body in variants.values())
+
+def _encode(content: Any) -> Dict[str, bytes]:
+    """Serializa a JSON y precomprime el resultado si vale la pena."""
+    body = json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    variants = {"identity": body}
+    if len(body) >= MIN_COMPRESS_SIZE:
+        variants["gzip"] = gzip.compress(body, compresslevel=6)
+        variants["br"] = brotli.compress(body, quality=9)
+    return variants
+
+def _accepted_encodings(accept_encoding: str) -> Dict[str, float]:
+    """Interpreta la cabecera Accept-Encoding como {codificación: q}."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name] = q
+    return accepted
+
+def select_variant(variants: Dict[str, bytes], accept_encoding: str) -> Optional[Tuple[str, bytes]]:
+    """
+    Elige la variante con mayor q según la cabecera Accept-Encoding; ENCODINGS
+    solo desempata. `identity` es aceptable salvo que se excluya (`identity;q=0`,
+    o `*;q=0` sin mencionarla). Devuelve None si ninguna variante es aceptable.
+    """
+    accepted = _accepted_encodings(accept_encoding)
+    wildcard = accepted.get("*")
+    best = None
+    for rank, encoding in enumerate(ENCODINGS):
+        if encoding not in variants:
+            continue
+        if encoding in accepted:
+            q = accepted[encoding]
+        elif wildcard is not None:
+            q = wildcard
+        elif encoding == "identity":
+            q = 0.001 # Aceptable, pero solo si no hay otra opción
+        else:
+            q = 0.0
+        if q > 0 and (best is None or q > best[0]):
+            best = (q, rank, encoding)
+    if best is None:
+        return None
+    return best[2], variants[best[2]]
+
+response_cache = ResponseCache()
@@ -2,11 +2,40 @@
 
 import json
 import os
-from typing import List, Dict, Any, Optional
-from pydantic import BaseModel
+import sqlite3
+import tempfile
+from collections import Counter
+from contextlib import closing
+from typing import List, Dict, Any, Optional, Callable, Iterable, Iterator, Tuple
+import numpy as np
+from pydantic import BaseModel, Field, ValidationError
+from . import snapshot
 
 DATA_DIR = "data"
 BOOKS_FILE = os.path.join(DATA_DIR, "books.json")
+PAGES_BUCKET_SIZE = 100
+MAX_REPORTED_IMPORT_ERRORS = 100
+MAX_LOOKUP_TITLES = 1000
+
+# Rangos admitidos para año y páginas. Las columnas de la instantánea son
+# int64; con estos límites ni los valores ni sus diferencias se desbordan.
+MIN_YEAR, MAX_YEAR = -10_000, 10_000
+MAX_PAGES = 1_000_000
+
+# Peso de cada rasgo en la distancia entre libros. Año y páginas se miden en
+# desviaciones estándar; país, idioma y autor suman su peso si son distintos.
+SIMILARITY_WEIGHTS = {"year": 1.0, "pages": 1.0, "country": 1.0, "language": 1.0, "author": 2.0}
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+# `books.json` sigue siendo la fuente de verdad, pero las lecturas se hacen
+# sobre una instantánea binaria compartida por todos los workers (ver
+# api/snapshot.py), que se vuelve a publicar en cada escritura.
+
+# Agregados del catálogo (por país, idioma, década y rango de páginas).
+# Viajan dentro de la instantánea y cada alta, baja o modificación los ajusta
+# en O(1), sin recorrer el catálogo completo.
+_stats: Optional[Dict[str, Any]] = None
+_stats_generation: Optional[int] = None
 
 # Modelo Pydantic para un libro
 class Book(BaseModel):
@@ -15,90 +44,443 @@ class Book(BaseModel):
     imageLink: str
     language: str
     link: str
-    pages: int
+    pages: int = Field(..., ge=0, le=MAX_PAGES)
     title: str
-    year: int
+    year: int = Field(..., ge=MIN_YEAR, le=MAX_YEAR)
 
-def get_all_books() -> List[Dict[str, Any]]:
-    """Lee y devuelve todos los libros del archivo JSON."""
+# Modelo para buscar varios libros por título en una sola petición
+class TitleLookup(BaseModel):
+    titles: List[str] = Field(..., min_length=1, max_length=MAX_LOOKUP_TITLES)
+
+def _books_file_mtime() -> Optional[int]:
+    """Devuelve la fecha de modificación del archivo de libros (o None si no existe)."""
+    try:
+        return os.stat(BOOKS_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def _load_books_file() -> List[Dict[str, Any]]:
+    """Lee los libros directamente del archivo JSON."""
     if not os.path.exists(BOOKS_FILE):
         return []
     with open(BOOKS_FILE, 'r', encoding='utf-8') as f:
         return json.load(f)
 
-def save_all_books(books: List[Dict[str, Any]]):
-    """Guarda la lista completa de libros en el archivo JSON."""
-    with open(BOOKS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(books, f, indent=4)
+def _snapshot() -> snapshot.Snapshot:
+    """
+    Devuelve la instantánea vigente. Solo se reconstruye a partir de
+    `books.json` si todavía no existe o si el archivo fue modificado desde
+    fuera de la API (p. ej. por el descargador).
+    """
+    snap = snapshot.current()
+    if snap is None or snap.source_mtime != _books_file_mtime():
+        with snapshot.write_lock():
+            snap = snapshot.current()
+            mtime = _books_file_mtime()
+            if snap is None or snap.source_mtime != mtime:
+                books = _load_books_file()
+                snap = snapshot.publish(books, _stats_to_json(_compute_stats(books)), mtime)
+    return snap
+
+def catalogue_version() -> int:
+    """Versión del catálogo: cambia con cada escritura, en cualquier worker."""
+    return _snapshot().generation
+
+def get_all_books() -> List[Dict[str, Any]]:
+    """Lee y devuelve todos los libros."""
+    return _snapshot().books()
+
+def save_all_books(books: List[Dict[str, Any]], stats: Optional[Dict[str, Any]] = None):
+    """
+    Guarda la lista completa de libros en el archivo JSON y publica la
+    instantánea correspondiente. Si no se pasan los agregados, se recalculan.
+    """
+    if stats is None:
+        stats = _compute_stats(books)
+    _save_stream(lambda: books, stats)
+
+def _write_books_file(books: Iterable[Dict[str, Any]], path: str):
+    """Escribe los libros en `path` con el mismo formato que `json.dump(..., indent=4)`."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("[")
+        written = False
+        for book in books:
+            f.write(",\n    " if written else "\n    ")
+            f.write(json.dumps(book, indent=4).replace("\n", "\n    "))
+            written = True
+        f.write("\n]" if written else "]")
+
+def _save_stream(make_books: Callable[[], Iterable[Dict[str, Any]]], stats: Dict[str, Any]):
+    """
+    Guarda el catálogo recorriéndolo dos veces (JSON e instantánea) sin
+    cargarlo entero en memoria. `make_books` debe devolver un iterable nuevo
+    en cada llamada.
+
+    `books.json` se escribe primero en un temporal y solo reemplaza al
+    original cuando la instantánea ya se publicó: si algo falla antes, la
+    fuente de verdad sigue intacta. El reemplazo conserva la fecha de
+    modificación del temporal, que es la que se registra en la instantánea.
+    """
+    global _stats, _stats_generation
+    tmp_path = BOOKS_FILE + ".tmp"
+    with snapshot.write_lock():
+        try:
+            _write_books_file(make_books(), tmp_path)
+            snap = snapshot.publish(make_books(), _stats_to_json(stats), os.stat(tmp_path).st_mtime_ns)
+            os.replace(tmp_path, BOOKS_FILE)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        _stats, _stats_generation = stats, snap.generation
+
+# --- Agregados ---
+
+def _apply_to_stats(stats: Dict[str, Any], book: Dict[str, Any], delta: int):
+    """
+    Suma (delta=1) o resta (delta=-1) un libro de los agregados. País e idioma
+    se cuentan sin distinguir mayúsculas, como los filtros; en `labels` se
+    guarda la primera grafía vista de cada uno para mostrarla.
+    """
+    stats["total"] += delta
+    keys = {
+        "country": book["country"].lower(),
+        "language": book["language"].lower(),
+        "decade": (book["year"] // 10) * 10,
+        "pages": (book["pages"] // PAGES_BUCKET_SIZE) * PAGES_BUCKET_SIZE,
+    }
+    for name, key in keys.items():
+        counter = stats[name]
+        counter[key] += delta
+        labels = stats["labels"].get(name)
+        if labels is not None:
+            labels.setdefault(key, book[name])
+        if counter[key] <= 0:
+            del counter[key]
+            if labels is not None:
+                del labels[key]
+    # Sumas y sumas de cuadrados: dan la media y la desviación de año y páginas en O(1)
+    moments = stats["moments"]
+    for name in ("year", "pages"):
+        moments[name] += delta * book[name]
+        moments[f"{name}_sq"] += delta * book[name] ** 2
+
+def _compute_stats(books: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Calcula los agregados desde cero (solo al reconstruir la instantánea)."""
+    stats = {
+        "total": 0, "country": Counter(), "language": Counter(), "decade": Counter(), "pages": Counter(),
+        "moments": Counter(), "labels": {"country": {}, "language": {}},
+    }
+    for book in books:
+        _apply_to_stats(stats, book, 1)
+    return stats
+
+def _stats_to_json(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """Convierte los agregados a JSON conservando las claves numéricas."""
+    return {name: list(value.items()) if isinstance(value, Counter) else value for name, value in stats.items()}
+
+def _ensure_stats() -> Dict[str, Any]:
+    """Devuelve los agregados, leyéndolos de la instantánea si otro worker escribió."""
+    global _stats, _stats_generation
+    snap = _snapshot()
+    if _stats is None or _stats_generation != snap.generation:
+        saved = snap.stats()
+        _stats = {name: value if name in ("total", "labels") else Counter(dict(value)) for name, value in saved.items()}
+        _stats_generation = snap.generation
+    return _stats
+
+def _copy_stats(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """Copia los agregados para modificarlos sin que otros hilos vean cambios a medias."""
+    copy = {name: value.copy() if isinstance(value, Counter) else value for name, value in stats.items()}
+    copy["labels"] = {name: labels.copy() for name, labels in stats["labels"].items()}
+    return copy
+
+def _save_change(books: List[Dict[str, Any]], old_book: Optional[Dict[str, Any]], new_book: Optional[Dict[str, Any]]):
+    """
+    Guarda el catálogo aplicando a los agregados solo la diferencia del cambio.
+    La diferencia se aplica sobre una copia, que se publica solo si el guardado
+    termina bien.
+    """
+    stats = _copy_stats(_ensure_stats())
+    if old_book:
+        _apply_to_stats(stats, old_book, -1)
+    if new_book:
+        _apply_to_stats(stats, new_book, 1)
+    save_all_books(books, stats)
+
+# --- Operaciones ---
 
 def find_book(title: str) -> Optional[Dict[str, Any]]:
     """Encuentra un libro por su título."""
-    books = get_all_books()
-    for book in books:
-        if book['title'].lower() == title.lower():
-            return book
-    return None
+    snap = _snapshot()
+    index = snap.find(title)
+    return snap.book(index) if index is not None else None
+
+def lookup_books(titles: List[str]) -> Dict[str, List[Any]]:
+    """
+    Busca varios títulos a la vez usando el índice de títulos de la instantánea
+    (búsqueda binaria por título). Los repetidos se resuelven una sola vez.
+    """
+    snap = _snapshot()
+    found, missing, seen = [], [], set()
+    for title in titles:
+        key = title.lower()
+        if key in seen:
+            continue
+        seen.add(key)
+        index = snap.find(title)
+        if index is None:
+            missing.append(title)
+        else:
+            found.append(snap.book(index))
+    return {"found": found, "missing": missing}
 
 def add_book(book_data: Book) -> Dict[str, Any]:
     """Añade un nuevo libro a la base de datos."""
-    books = get_all_books()
-    if find_book(book_data.title):
-        raise ValueError("El libro con este título ya existe.")
-    
-    books.append(book_data.model_dump())
-    save_all_books(books)
+    with snapshot.write_lock():
+        snap = _snapshot()
+        if snap.find(book_data.title) is not None:
+            raise ValueError("El libro con este título ya existe.")
+
+        books = snap.books()
+        books.append(book_data.model_dump())
+        _save_change(books, None, books[-1])
     return book_data.model_dump()
 
 def delete_book(title: str) -> bool:
     """Elimina un libro por su título."""
-    books = get_all_books()
-    book_to_delete = find_book(title)
-    if not book_to_delete:
-        return False
-        
-    books.remove(book_to_delete)
-    save_all_books(books)
+    with snapshot.write_lock():
+        snap = _snapshot()
+        index = snap.find(title)
+        if index is None:
+            return False
+
+        books = snap.books()
+        book_to_delete = books.pop(index)
+        _save_change(books, book_to_delete, None)
     return True
 
 def update_book(title: str, new_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """Actualiza los datos de un libro existente."""
-    books = get_all_books()
-    for i, book in enumerate(books):
-        if book['title'].lower() == title.lower():
-            # Actualiza solo los campos proporcionados
-            updated_book_data = book.copy()
-            updated_book_data.update(new_data)
-            
-            # Valida con Pydantic antes de guardar
-            validated_book = Book(**updated_book_data)
-            books[i] = validated_book.model_dump()
-            save_all_books(books)
-            return books[i]
-    return None
+    with snapshot.write_lock():
+        snap = _snapshot()
+        index = snap.find(title)
+        if index is None:
+            return None
+
+        books = snap.books()
+        book = books[index]
+        # Actualiza solo los campos proporcionados
+        updated_book_data = book.copy()
+        updated_book_data.update(new_data)
+
+        # Valida con Pydantic antes de guardar
+        validated_book = Book(**updated_book_data)
+        books[index] = validated_book.model_dump()
+        _save_change(books, book, books[index])
+        return books[index]
+
+def page_books(
+    year_min: Optional[int] = None,
+    year_max: Optional[int] = None,
+    pages_min: Optional[int] = None,
+    pages_max: Optional[int] = None,
+    language: Optional[str] = None,
+    country: Optional[str] = None,
+    offset: int = 0,
+    limit: Optional[int] = None,
+) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    Filtra libros por rangos de año y páginas e igualdad de idioma y país, y
+    devuelve el total de coincidencias junto con la página pedida.
+    Los predicados se evalúan con máscaras de NumPy sobre las columnas de la
+    instantánea; solo se decodifican los libros de la página.
+    """
+    snap = _snapshot()
+    columns = snap.columns()
+    mask = None
+    for column, low, high in (("year", year_min, year_max), ("pages", pages_min, pages_max)):
+        if low is not None:
+            mask = _and(mask, columns[column] >= low)
+        if high is not None:
+            mask = _and(mask, columns[column] <= high)
+    for column, value in (("language", language), ("country", country)):
+        if value is not None:
+            mask = _and(mask, np.isin(columns[column], snap.category_codes(column, value)))
+
+    # Sin filtros no hace falta recorrer las columnas: la página sale directa
+    indices = range(len(snap)) if mask is None else np.flatnonzero(mask)
+    end = len(indices) if limit is None else offset + limit
+    return len(indices), [snap.book(int(i)) for i in indices[offset:end]]
+
+def _and(mask: Optional[np.ndarray], condition: np.ndarray) -> np.ndarray:
+    """Combina una condición con la máscara acumulada (None si aún no hay ninguna)."""
+    return condition if mask is None else mask & condition
+
+def filter_books(**filters) -> List[Dict[str, Any]]:
+    """Filtra libros (mismos criterios que `page_books`) y los devuelve todos."""
+    return page_books(**filters)[1]
 
 def find_books_by_country(country: str) -> List[Dict[str, Any]]:
     """Encuentra todos los libros de un país específico."""
-    books = get_all_books()
-    return [book for book in books if book['country'].lower() == country.lower()]
+    return filter_books(country=country)
 
 def suggest_book_by_pages(page_count: int) -> List[Dict[str, Any]]:
     """Sugiere libros con la cantidad de páginas más cercana a la dada."""
-    books = get_all_books()
-    if not books:
+    snap = _snapshot()
+    if not len(snap):
         return []
 
-    # Calcula la diferencia de páginas para cada libro
-    for book in books:
-        book['page_diff'] = abs(book['pages'] - page_count)
+    # Acotar el objetivo al rango de la columna no cambia el resultado y evita
+    # desbordar el int64 con valores enormes.
+    pages = snap.columns()["pages"]
+    page_count = min(max(page_count, int(pages.min())), int(pages.max()))
+    # Diferencia de páginas de cada libro y libros con la diferencia mínima
+    page_diff = np.abs(pages - page_count)
+    closest = np.flatnonzero(page_diff == page_diff.min())
+    return [snap.book(int(i)) for i in closest]
+
+def _std(stats: Dict[str, Any], name: str) -> float:
+    """Desviación estándar de un campo numérico a partir de los agregados."""
+    total = stats["total"]
+    if not total:
+        return 1.0
+    mean = stats["moments"][name] / total
+    variance = stats["moments"][f"{name}_sq"] / total - mean ** 2
+    return variance ** 0.5 if variance > 0 else 1.0
+
+def similar_books(title: str, k: int = 5) -> Optional[List[Dict[str, Any]]]:
+    """
+    Devuelve los `k` libros más parecidos al indicado (None si no existe).
+    La distancia se calcula con un único recorrido vectorizado sobre las
+    columnas de la instantánea, que se republican en cada escritura; la
+    escala de año y páginas sale de los agregados, mantenidos en O(1).
+    """
+    snap = _snapshot()
+    index = snap.find(title)
+    if index is None:
+        return None
+
+    columns = snap.columns()
+    stats = _ensure_stats()
+    distance = np.zeros(len(snap))
+    for name in ("year", "pages"):
+        delta = (columns[name] - columns[name][index]) / _std(stats, name)
+        distance += SIMILARITY_WEIGHTS[name] * delta ** 2
+    # Los códigos no distinguen mayúsculas, igual que los filtros por categoría
+    for name in snapshot.CATEGORY_COLUMNS:
+        distance += SIMILARITY_WEIGHTS[name] * (columns[name] != columns[name][index])
+    distance[index] = np.inf # El propio libro no cuenta
+
+    k = min(k, len(snap) - 1)
+    if k <= 0:
+        return []
+    nearest = np.argpartition(distance, k - 1)[:k]
+    nearest = nearest[np.argsort(distance[nearest], kind="stable")]
+    return [snap.book(int(i)) for i in nearest]
+
+# --- Importación y exportación (NDJSON) ---
+
+def iter_books_ndjson() -> Iterator[bytes]:
+    """
+    Exporta el catálogo como NDJSON, copiando los registros tal cual están en
+    la instantánea y agrupándolos en bloques de EXPORT_CHUNK_SIZE bytes.
+    """
+    snap = _snapshot()
+    chunk = bytearray()
+    for i in range(len(snap)):
+        chunk += snap.record_bytes(i)
+        chunk += b"\n"
+        if len(chunk) >= EXPORT_CHUNK_SIZE:
+            yield bytes(chunk)
+            chunk.clear()
+    if chunk:
+        yield bytes(chunk)
+
+def _describe_validation_error(error: ValidationError) -> str:
+    """Resume un error de Pydantic en una sola línea."""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc']) or 'línea'}: {err['msg']}"
+        for err in error.errors(include_url=False)
+    )
+
+def _mark_seen(seen_titles: sqlite3.Connection, title: str) -> bool:
+    """Registra el título normalizado; False si ya se había visto."""
+    cursor = seen_titles.execute("INSERT OR IGNORE INTO seen VALUES (?)", (title.lower(),))
+    return cursor.rowcount == 1
+
+def import_books(lines: Iterable[bytes]) -> Dict[str, Any]:
+    """
+    Importa libros desde líneas NDJSON. Cada línea se valida contra `Book` y
+    los títulos repetidos (en el catálogo o en la propia importación) se
+    rechazan. Las filas válidas se guardan aunque otras fallen; se informan
+    como mucho MAX_REPORTED_IMPORT_ERRORS errores, con su número de línea.
+    Los agregados se actualizan sobre una copia que solo se publica si el
+    guardado termina bien.
+    """
+    imported, failed, errors = 0, 0, []
+
+    def reject(line_number: int, message: str):
+        nonlocal failed
+        failed += 1
+        if len(errors) < MAX_REPORTED_IMPORT_ERRORS:
+            errors.append({"line": line_number, "error": message})
+
+    # Los títulos ya aceptados se registran en una base SQLite temporal en disco
+    # (nombre vacío), así la memoria no crece con el tamaño de la importación.
+    with snapshot.write_lock(), tempfile.TemporaryFile() as accepted, closing(sqlite3.connect("")) as seen_titles:
+        seen_titles.execute("CREATE TABLE seen (title TEXT PRIMARY KEY) WITHOUT ROWID")
+        snap = _snapshot()
+        stats = _copy_stats(_ensure_stats())
+        for line_number, line in enumerate(lines, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                book = Book.model_validate_json(line)
+            except ValidationError as e:
+                reject(line_number, _describe_validation_error(e))
+                continue
+            if snap.find(book.title) is not None or not _mark_seen(seen_titles, book.title):
+                reject(line_number, "El libro con este título ya existe.")
+                continue
+            accepted.write(book.model_dump_json().encode("utf-8") + b"\n")
+            _apply_to_stats(stats, book.model_dump(), 1)
+            imported += 1
+
+        if imported:
+            def all_books():
+                yield from snap.iter_books()
+                accepted.seek(0)
+                for row in accepted:
+                    yield json.loads(row)
+            _save_stream(all_books, stats)
+
+    return {"imported": imported, "failed": failed, "errors": errors}
+
+# --- Estadísticas ---
+
+def count_books() -> int:
+    """Devuelve el número total de libros del catálogo."""
+    return _ensure_stats()["total"]
+
+def count_by_country() -> Dict[str, int]:
+    """Cantidad de libros por país."""
+    stats = _ensure_stats()
+    return {stats["labels"]["country"][key]: count for key, count in stats["country"].most_common()}
 
-    # Encuentra la diferencia mínima
-    min_diff = min(book['page_diff'] for book in books)
+def count_by_language() -> Dict[str, int]:
+    """Cantidad de libros por idioma."""
+    stats = _ensure_stats()
+    return {stats["labels"]["language"][key]: count for key, count in stats["language"].most_common()}
 
-    # Filtra los libros que tienen esa diferencia mínima
-    closest_books = [book for book in books if book['page_diff'] == min_diff]
-    
-    # Limpia la clave temporal 'page_diff' antes de devolver
-    for book in closest_books:
-        del book['page_diff']
+def count_by_decade() -> Dict[int, int]:
+    """Cantidad de libros por década de publicación."""
+    return dict(sorted(_ensure_stats()["decade"].items()))
 
-    return closest_books
\ No newline at end of file
+def pages_histogram() -> List[Dict[str, int]]:
+    """Histograma de libros por rangos de PAGES_BUCKET_SIZE páginas."""
+    return [
+        {"from": start, "to": start + PAGES_BUCKET_SIZE - 1, "count": count}
+        for start, count in sorted(_ensure_stats()["pages"].items())
+    ]
\ No newline at end of file
@@ -1,9 +1,15 @@
 # api/endpoints.py
 
-from fastapi import APIRouter, HTTPException, Depends, status, Body
+import tempfile
+from fastapi import APIRouter, HTTPException, Depends, status, Body, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response, StreamingResponse
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from typing import List, Dict, Any
+from pydantic import ValidationError
+from typing import List, Dict, Any, Optional, Callable, Hashable
 from . import crud
+from .cache import response_cache, select_variant
 from utils.auth import login_user
 from utils.logger import log_operation
 
@@ -22,13 +28,39 @@ def get_current_user(credentials: HTTPBasicCredentials = Depends(security)):
         )
     return credentials.username
 
+def cached_json_response(
+    request: Request,
+    key: Hashable,
+    build: Callable[[], Any],
+    cacheable: Optional[Callable[[Any], bool]] = None,
+) -> Response:
+    """
+    Devuelve una respuesta JSON desde la caché de respuestas (ver api/cache.py),
+    en la codificación que mejor encaje con el Accept-Encoding del cliente.
+    """
+    variants = response_cache.get_or_build(key, crud.catalogue_version(), build, cacheable)
+    selected = select_variant(variants, request.headers.get("accept-encoding", ""))
+    if selected is None:
+        raise HTTPException(status_code=406, detail="Ninguna codificación aceptable (Accept-Encoding).")
+    encoding, body = selected
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
 # --- Rutas Públicas ---
 
 @router.get("/books", response_model=List[crud.Book])
-def list_books():
+def list_books(request: Request):
     """Obtiene una lista de todos los libros."""
     log_operation("GUEST", "LIST_BOOKS")
-    return crud.get_all_books()
+    return cached_json_response(request, ("books",), crud.get_all_books)
+
+@router.get("/books/export")
+def export_books():
+    """Exporta el catálogo completo como NDJSON (un libro por línea), en streaming."""
+    log_operation("GUEST", "EXPORT_BOOKS")
+    return StreamingResponse(crud.iter_books_ndjson(), media_type="application/x-ndjson")
 
 @router.get("/books/title/{title}", response_model=crud.Book)
 def get_book(title: str):
@@ -40,12 +72,57 @@ def get_book(title: str):
     log_operation("GUEST", "GET_BOOK", title, "Success")
     return book
 
+@router.post("/books/lookup")
+def lookup_books(lookup: crud.TitleLookup):
+    """Busca varios libros por título en una sola petición."""
+    result = crud.lookup_books(lookup.titles)
+    log_operation("GUEST", "LOOKUP_BOOKS", f"{len(lookup.titles)} titles", f"Found {len(result['found'])}, missing {len(result['missing'])}")
+    return {"count": len(result["found"]), **result}
+
 @router.get("/books/country/{country}")
-def get_books_by_country(country: str):
+def get_books_by_country(country: str, request: Request):
     """Obtiene libros por país."""
-    books = crud.find_books_by_country(country)
-    log_operation("GUEST", "GET_BY_COUNTRY", f"Country: {country}", f"Found {len(books)} books")
-    return {"country": country, "count": len(books), "books": books}
+    def build():
+        books = crud.find_books_by_country(country)
+        return {"country": country, "count": len(books), "books": books}
+    log_operation("GUEST", "GET_BY_COUNTRY", f"Country: {country}")
+    # Los países sin libros no se guardan: cualquier texto en la URL crearía una entrada.
+    return cached_json_response(request, ("country", country), build, cacheable=lambda content: content["count"] > 0)
+
+@router.get("/books/filter")
+def filter_books(
+    year_min: Optional[int] = None,
+    year_max: Optional[int] = None,
+    pages_min: Optional[int] = None,
+    pages_max: Optional[int] = None,
+    language: Optional[str] = None,
+    country: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+):
+    """
+    Filtra libros por rangos de año y páginas, idioma y país.
+    Con `offset` y `limit` devuelve solo una página; `count` es siempre el total.
+    """
+    filters = {
+        "year_min": year_min, "year_max": year_max,
+        "pages_min": pages_min, "pages_max": pages_max,
+        "language": language, "country": country,
+    }
+    count, books = crud.page_books(**filters, offset=offset, limit=limit)
+    applied = {name: value for name, value in filters.items() if value is not None}
+    log_operation("GUEST", "FILTER_BOOKS", str(applied), f"Found {count} books")
+    return {"filters": applied, "count": count, "offset": offset, "books": books}
+
+@router.get("/books/{title}/similar")
+def get_similar_books(title: str, k: int = Query(5, ge=1, le=50)):
+    """Recomienda libros parecidos por páginas, año, país, idioma y autor."""
+    books = crud.similar_books(title, k)
+    if books is None:
+        log_operation("GUEST", "SIMILAR_BOOKS", title, "Failure - Not Found")
+        raise HTTPException(status_code=404, detail="Libro no encontrado")
+    log_operation("GUEST", "SIMILAR_BOOKS", title, f"Found {len(books)} recommendations")
+    return {"title": title, "count": len(books), "similar": books}
 
 @router.get("/books/suggest/pages/{pages}")
 def get_books_by_page_suggestion(pages: int):
@@ -54,6 +131,47 @@ def get_books_by_page_suggestion(pages: int):
     log_operation("GUEST", "SUGGEST_BY_PAGES", f"Pages: {pages}", f"Found {len(books)} suggestions")
     return {"page_target": pages, "count": len(books), "suggestions": books}
 
+# --- Estadísticas ---
+
+@router.get("/stats")
+def get_stats_summary():
+    """Resumen del catálogo: total de libros y cantidad de países, idiomas y décadas."""
+    log_operation("GUEST", "STATS_SUMMARY")
+    return {
+        "total": crud.count_books(),
+        "countries": len(crud.count_by_country()),
+        "languages": len(crud.count_by_language()),
+        "decades": len(crud.count_by_decade()),
+    }
+
+@router.get("/stats/countries")
+def get_stats_by_country():
+    """Cantidad de libros por país."""
+    log_operation("GUEST", "STATS_COUNTRIES")
+    return {"total": crud.count_books(), "countries": crud.count_by_country()}
+
+@router.get("/stats/languages")
+def get_stats_by_language():
+    """Cantidad de libros por idioma."""
+    log_operation("GUEST", "STATS_LANGUAGES")
+    return {"total": crud.count_books(), "languages": crud.count_by_language()}
+
+@router.get("/stats/decades")
+def get_stats_by_decade():
+    """Cantidad de libros por década de publicación."""
+    log_operation("GUEST", "STATS_DECADES")
+    return {"total": crud.count_books(), "decades": crud.count_by_decade()}
+
+@router.get("/stats/pages")
+def get_stats_pages_histogram():
+    """Histograma de libros por número de páginas."""
+    log_operation("GUEST", "STATS_PAGES")
+    return {
+        "total": crud.count_books(),
+        "bucket_size": crud.PAGES_BUCKET_SIZE,
+        "histogram": crud.pages_histogram(),
+    }
+
 # --- Rutas Protegidas ---
 
 @router.post("/books", response_model=crud.Book, status_code=status.HTTP_201_CREATED)
@@ -67,6 +185,21 @@ def add_book(book: crud.Book, username: str = Depends(get_current_user)):
         log_operation(username, "ADD_BOOK", book.title, f"Failure - {e}")
         raise HTTPException(status_code=409, detail=str(e))
 
+@router.post("/books/import")
+async def import_books(request: Request, username: str = Depends(get_current_user)):
+    """
+    Importa libros desde un cuerpo NDJSON (requiere autenticación).
+    El cuerpo se lee por bloques y se vuelca a un archivo temporal, así que
+    el tamaño de la importación no depende de la memoria disponible.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as body:
+        async for chunk in request.stream():
+            body.write(chunk)
+        body.seek(0)
+        result = await run_in_threadpool(crud.import_books, body)
+    log_operation(username, "IMPORT_BOOKS", "N/A", f"Imported {result['imported']}, failed {result['failed']}")
+    return result
+
 @router.delete("/books/{title}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_book(title: str, username: str = Depends(get_current_user)):
     """Elimina un libro por su título (requiere autenticación)."""
@@ -79,7 +212,12 @@ def delete_book(title: str, username: str = Depends(get_current_user)):
 @router.put("/books/{title}", response_model=crud.Book)
 def update_book(title: str, new_data: Dict[str, Any] = Body(...), username: str = Depends(get_current_user)):
     """Actualiza un libro (requiere autenticación)."""
-    updated_book = crud.update_book(title, new_data)
+    try:
+        updated_book = crud.update_book(title, new_data)
+    except ValidationError as e:
+        # Campos fuera de rango (p. ej. `pages`) se rechazan antes de guardar
+        log_operation(username, "UPDATE_BOOK", title, "Failure - Invalid data")
+        raise RequestValidationError(e.errors())
     if not updated_book:
         log_operation(username, "UPDATE_BOOK", title, "Failure - Not Found")
         raise HTTPException(status_code=404, detail="Libro no encontrado")
@@ -0,0 +1,405 @@
+# api/snapshot.py
+
+"""
+Instantánea binaria y de solo lectura del catálogo, compartida entre procesos.
+
+Con `uvicorn api.main:app --workers N` cada worker mapea en memoria (mmap) el
+mismo archivo `books.snapshot.<generación>`, así que las páginas las comparte
+el sistema operativo y el consumo no crece con el número de workers. Un
+contador de generación de 8 bytes (`books.gen`, también mapeado) permite a cada
+worker saber, con una simple lectura de memoria, que otro proceso publicó una
+instantánea nueva y cambiar a ella. Cada generación se escribe en un archivo
+nuevo porque en Windows no se puede reemplazar un archivo mapeado.
+
+Formato (orden de bytes nativo, la instantánea es un artefacto local):
+    cabecera   MAGIC, versión, nº de libros, mtime de books.json, nº de secciones
+    secciones  tabla de (nombre, offset, longitud), datos alineados a 8 bytes
+        records  cada libro como JSON compacto en UTF-8
+        recoff   offsets (Q) de cada registro dentro de `records`
+        tkeyoff  offsets (Q) de cada título normalizado dentro de `tkeys`
+        tkeys    títulos en minúsculas, ordenados
+        tidx     índice (I) del registro correspondiente a cada título ordenado
+        stats    agregados del catálogo en JSON
+        year     columna (q) con el año de cada libro
+        pages    columna (q) con las páginas de cada libro
+        language columna (I) con el código del idioma de cada libro
+        country  columna (I) con el código del país de cada libro
+        author   columna (I) con el código del autor de cada libro
+        cats     valores de los códigos de idioma, país y autor, en JSON; los
+                 códigos no distinguen mayúsculas y guardan la primera grafía vista
+
+Las columnas se exponen como arrays de NumPy sobre el propio mmap (sin copia),
+para evaluar filtros con máscaras vectorizadas.
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+from array import array
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DATA_DIR = "data"
+SNAPSHOT_FILE = os.path.join(DATA_DIR, "books.snapshot")
+GENERATION_FILE = os.path.join(DATA_DIR, "books.gen")
+LOCK_FILE = os.path.join(DATA_DIR, "books.lock")
+
+MAGIC = b"BKSNAP01"
+FORMAT_VERSION = 5
+_HEADER = struct.Struct("=8sIIqI")
+_SECTION = struct.Struct("=8sQQ")
+# Bytes de cada título que se comparan por pasada al construir el índice.
+_KEY_CHUNK = 16
+_SORT_BATCH = 4096
+_GENERATION = struct.Struct("=Q")
+_SECTIONS = 12
+NUMERIC_COLUMNS = {"year": "q", "pages": "q"}
+CATEGORY_COLUMNS = ("language", "country", "author")
+
+class Snapshot:
+    """Vista de solo lectura sobre una instantánea mapeada en memoria."""
+
+    def __init__(self, mm: mmap.mmap, generation: int):
+        self.generation = generation
+        self._mm = mm
+        magic, version, self.count, source_mtime, nsections = _HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("Instantánea del catálogo con formato desconocido.")
+        self.source_mtime = None if source_mtime < 0 else source_mtime
+
+        self._sections = {}
+        for i in range(nsections):
+            name, offset, length = _SECTION.unpack_from(mm, _HEADER.size + i * _SECTION.size)
+            self._sections[name.rstrip(b"\0").decode()] = (offset, length)
+
+        self._records_base = self._sections["records"][0]
+        self._tkeys_base = self._sections["tkeys"][0]
+        self._recoff = self.section("recoff").cast("Q")
+        self._tkeyoff = self.section("tkeyoff").cast("Q")
+        self._tidx = self.section("tidx").cast("I")
+        self._columns = None
+        self._categories = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def section(self, name: str) -> memoryview:
+        """Devuelve una sección como memoryview, sin copiar datos."""
+        offset, length = self._sections[name]
+        return memoryview(self._mm)[offset:offset + length]
+
+    def record_bytes(self, index: int) -> bytes:
+        """JSON compacto del libro en la posición dada."""
+        base = self._records_base
+        return self._mm[base + self._recoff[index]:base + self._recoff[index + 1]]
+
+    def book(self, index: int) -> Dict[str, Any]:
+        """Decodifica el libro en la posición dada."""
+        return json.loads(self.record_bytes(index))
+
+    def iter_books(self) -> Iterator[Dict[str, Any]]:
+        """Recorre los libros decodificándolos de uno en uno."""
+        for i in range(self.count):
+            yield self.book(i)
+
+    def books(self) -> List[Dict[str, Any]]:
+        """Decodifica todos los libros."""
+        return list(self.iter_books())
+
+    def find(self, title: str) -> Optional[int]:
+        """Busca un título (sin distinguir mayúsculas) con búsqueda binaria sobre el índice."""
+        key = title.lower().encode("utf-8")
+        base, offsets = self._tkeys_base, self._tkeyoff
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._mm[base + offsets[mid]:base + offsets[mid + 1]] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and self._mm[base + offsets[lo]:base + offsets[lo + 1]] == key:
+            return self._tidx[lo]
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Agregados guardados junto con la instantánea."""
+        return json.loads(bytes(self.section("stats")))
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Columnas numéricas y de códigos categóricos como arrays de NumPy (sin copia)."""
+        if self._columns is None:
+            columns = {name: np.frombuffer(self.section(name), dtype=np.int64) for name in NUMERIC_COLUMNS}
+            for name in CATEGORY_COLUMNS:
+                columns[name] = np.frombuffer(self.section(name), dtype=np.uint32)
+            self._columns = columns
+        return self._columns
+
+    def category_codes(self, column: str, value: str) -> List[int]:
+        """Códigos de una columna categórica cuyo valor coincide (sin distinguir mayúsculas)."""
+        if self._categories is None:
+            cats = json.loads(bytes(self.section("cats")))
+            self._categories = {name: {label.lower(): code for code, label in enumerate(labels)} for name, labels in cats.items()}
+        code = self._categories[column].get(value.lower())
+        return [] if code is None else [code]
+
+# --- Contador de generación y bloqueo entre procesos ---
+
+_generation_map: Optional[mmap.mmap] = None
+_current: Optional[Snapshot] = None
+_swap_lock = threading.Lock()
+_write_thread_lock = threading.Lock()
+_lock_state = threading.local()
+
+def _generation_counter() -> mmap.mmap:
+    """Mapea (creándolo si hace falta) el contador de generación compartido."""
+    global _generation_map
+    if _generation_map is None:
+        os.makedirs(DATA_DIR, exist_ok=True)
+        fd = os.open(GENERATION_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < _GENERATION.size:
+                os.ftruncate(fd, _GENERATION.size)
+            _generation_map = mmap.mmap(fd, _GENERATION.size)
+        finally:
+            os.close(fd)
+    return _generation_map
+
+def generation() -> int:
+    """Generación publicada más reciente (una lectura de memoria compartida)."""
+    return _GENERATION.unpack_from(_generation_counter(), 0)[0]
+
+@contextmanager
+def write_lock():
+    """
+    Bloqueo exclusivo entre procesos (y entre hilos) para publicar instantáneas.
+    Es reentrante dentro de un mismo hilo.
+    """
+    depth = getattr(_lock_state, "depth", 0)
+    if depth:
+        _lock_state.depth = depth + 1
+        try:
+            yield
+        finally:
+            _lock_state.depth -= 1
+        return
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    with _write_thread_lock, open(LOCK_FILE, "a+") as lock_file:
+        _lock_file(lock_file)
+        _lock_state.depth = 1
+        try:
+            yield
+        finally:
+            _lock_state.depth = 0
+            _unlock_file(lock_file)
+
+def _lock_file(lock_file):
+    """Bloqueo exclusivo del archivo de bloqueo (flock en POSIX, msvcrt en Windows)."""
+    if fcntl is not None:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return
+    lock_file.seek(0)
+    while True:
+        try:
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            pass # LK_LOCK se rinde tras unos reintentos; seguimos esperando
+
+def _unlock_file(lock_file):
+    """Libera el bloqueo tomado con `_lock_file`."""
+    if fcntl is not None:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return
+    lock_file.seek(0)
+    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+# --- Lectura y publicación ---
+
+def current() -> Optional[Snapshot]:
+    """
+    Devuelve la instantánea vigente, cambiando a la nueva si otro proceso
+    publicó una desde la última lectura. None si todavía no existe ninguna
+    (o si es de un formato anterior).
+    """
+    global _current
+    gen = generation()
+    snapshot = _current
+    if snapshot is not None and snapshot.generation == gen:
+        return snapshot
+    with _swap_lock:
+        if _current is None or _current.generation != gen:
+            try:
+                with open(_snapshot_path(gen), "rb") as f:
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                _current = Snapshot(mm, gen)
+            except (FileNotFoundError, ValueError, KeyError):
+                # Sin instantánea o con un formato anterior: hay que reconstruirla
+                return None
+        return _current
+
+def _write_section(f, table: List[bytes], name: str, data: bytes):
+    """Escribe una sección alineada a 8 bytes y anota su entrada en la tabla."""
+    f.write(b"\0" * (-f.tell() % 8))
+    table.append(_SECTION.pack(name.encode(), f.tell(), len(data)))
+    f.write(data)
+
+def _sort_keys(keys: bytearray, keyoff: array) -> np.ndarray:
+    """
+    Orden de los títulos normalizados (índices de registro), sin crear un
+    objeto de Python por título. Se ordena con NumPy por bloques de
+    _KEY_CHUNK bytes: cada pasada solo vuelve a ordenar, dentro de su grupo,
+    los títulos que siguen empatados. A igual título gana el índice menor.
+    """
+    count = len(keyoff) - 1
+    order = np.arange(count, dtype=np.uint32)
+    group = np.zeros(count, dtype=np.uint32)  # Inicio del grupo de cada posición
+    lengths = np.diff(np.frombuffer(keyoff, dtype=np.uint64)).astype(np.int32)
+    active = order.copy() if count > 1 else order[:0]
+    depth = 0
+    while active.size:
+        idx = order[active]
+        chunk = bytearray()
+        for batch in range(0, idx.size, _SORT_BATCH):
+            for i in idx[batch:batch + _SORT_BATCH].tolist():
+                start = keyoff[i] + depth
+                chunk += keys[start:min(start + _KEY_CHUNK, keyoff[i + 1])].ljust(_KEY_CHUNK, b"\0")
+        heads = np.frombuffer(chunk, dtype=f"S{_KEY_CHUNK}")
+        # Con relleno de ceros, a igual bloque el título más corto va primero;
+        # los que aún no se agotaron comparten el valor _KEY_CHUNK + 1.
+        remaining = np.minimum(lengths[idx] - depth, _KEY_CHUNK + 1).astype(np.int8)
+        groups = group[active]
+        perm = np.lexsort((remaining, heads, groups))
+        order[active] = idx[perm]
+        heads, remaining = heads[perm], remaining[perm]
+        del idx, perm, chunk
+        same = groups[1:] == groups[:-1]
+        same &= heads[1:] == heads[:-1]
+        same &= remaining[1:] == remaining[:-1]
+        del groups, heads
+        # Cada posición pasa a apuntar al inicio de su grupo
+        starts = np.arange(active.size, dtype=np.uint32)
+        starts[1:][same] = 0
+        np.maximum.accumulate(starts, out=starts)
+        group[active] = active[starts]
+        del starts
+        tied = np.zeros(active.size, dtype=bool)
+        tied[1:] |= same
+        tied[:-1] |= same
+        tied &= remaining > _KEY_CHUNK
+        active = active[tied]
+        depth += _KEY_CHUNK
+    return order
+
+def _write(f, books: Iterable[Dict[str, Any]], stats: Dict[str, Any], source_mtime: Optional[int]):
+    """
+    Serializa el catálogo en el formato binario de la instantánea. Los libros
+    se escriben a medida que se recorren; en memoria solo quedan arrays
+    compactos (offsets, columnas y títulos normalizados en un único buffer),
+    sin un objeto de Python por libro.
+    """
+    table: List[bytes] = []
+    f.seek(_HEADER.size + _SECTIONS * _SECTION.size)
+
+    f.write(b"\0" * (-f.tell() % 8))
+    records_start = f.tell()
+    recoff = array("Q", [0])
+    keys, keyoff = bytearray(), array("Q", [0])
+    numeric = {name: array(typecode) for name, typecode in NUMERIC_COLUMNS.items()}
+    codes = {name: array("I") for name in CATEGORY_COLUMNS}
+    # Código por valor en minúsculas, y la primera grafía vista de cada código
+    categories: Dict[str, Dict[str, int]] = {name: {} for name in CATEGORY_COLUMNS}
+    labels: Dict[str, List[str]] = {name: [] for name in CATEGORY_COLUMNS}
+    for book in books:
+        record = json.dumps(book, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        f.write(record)
+        recoff.append(recoff[-1] + len(record))
+        key = book["title"].lower().encode("utf-8")
+        keys += key
+        keyoff.append(len(keys))
+        for name, column in numeric.items():
+            column.append(book[name])
+        for name, column in codes.items():
+            code = categories[name].setdefault(book[name].lower(), len(categories[name]))
+            if code == len(labels[name]):
+                labels[name].append(book[name])
+            column.append(code)
+    table.append(_SECTION.pack(b"records", records_start, recoff[-1]))
+
+    count = len(keyoff) - 1
+    order = _sort_keys(keys, keyoff)
+    # Los títulos ordenados se vuelcan directamente al archivo.
+    f.write(b"\0" * (-f.tell() % 8))
+    tkeys_start = f.tell()
+    tkeyoff = array("Q", [0])
+    for batch in range(0, count, _SORT_BATCH):
+        for i in order[batch:batch + _SORT_BATCH].tolist():
+            f.write(keys[keyoff[i]:keyoff[i + 1]])
+            tkeyoff.append(tkeyoff[-1] + keyoff[i + 1] - keyoff[i])
+    table.append(_SECTION.pack(b"tkeys", tkeys_start, tkeyoff[-1]))
+    del keys, keyoff
+
+    _write_section(f, table, "recoff", recoff.tobytes())
+    _write_section(f, table, "tkeyoff", tkeyoff.tobytes())
+    _write_section(f, table, "tidx", order.tobytes())
+    _write_section(f, table, "stats", json.dumps(stats, ensure_ascii=False).encode("utf-8"))
+    for name, column in {**numeric, **codes}.items():
+        _write_section(f, table, name, column.tobytes())
+    _write_section(f, table, "cats", json.dumps(labels, ensure_ascii=False).encode("utf-8"))
+
+    f.seek(0)
+    f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, count, -1 if source_mtime is None else source_mtime, len(table)))
+    f.write(b"".join(table))
+
+def _snapshot_path(gen: int) -> str:
+    """Archivo de la instantánea de una generación."""
+    return f"{SNAPSHOT_FILE}.{gen}"
+
+def _remove_old_snapshots(keep: str):
+    """
+    Borra las instantáneas de generaciones anteriores. Si algún proceso aún
+    tiene una mapeada (en Windows no se puede borrar), se reintenta en la
+    siguiente publicación.
+    """
+    prefix = os.path.basename(SNAPSHOT_FILE)
+    for name in os.listdir(DATA_DIR):
+        path = os.path.join(DATA_DIR, name)
+        if name.startswith(prefix) and path != keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def publish(books: Iterable[Dict[str, Any]], stats: Dict[str, Any], source_mtime: Optional[int]) -> Snapshot:
+    """
+    Escribe la instantánea de la siguiente generación en un archivo nuevo e
+    incrementa el contador. Debe llamarse dentro de `write_lock()`.
+    """
+    new_generation = generation() + 1
+    path = _snapshot_path(new_generation)
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            _write(f, books, stats, source_mtime)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+
+    counter = _generation_counter()
+    _GENERATION.pack_into(counter, 0, new_generation)
+    counter.flush()
+    snap = current()
+    _remove_old_snapshots(keep=path)
+    return snap
@@ -1,16 +1,29 @@
 # book_app/cli/display.py
 
 import os
-from rich.console import Console
-from rich.table import Table
-from rich.panel import Panel
-from term_image.image import from_file
-from typing import Optional
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
 
 # Definición de variables globales
 DATA_DIR = "data"
 IMAGES_DIR = os.path.join(DATA_DIR, "images")
-console = Console()
+MIN_PAGE_SIZE = 5
+MAX_CACHED_PAGES = 20
+
+class _LazyConsole:
+    """
+    Consola de `rich` que se crea la primera vez que se usa, para no pagar
+    la importación de `rich` al arrancar la CLI.
+    """
+    _console = None
+
+    def __getattr__(self, name):
+        if _LazyConsole._console is None:
+            from rich.console import Console
+            _LazyConsole._console = Console()
+        return getattr(_LazyConsole._console, name)
+
+console = _LazyConsole()
 
 def display_book(book: dict, with_image: bool = True):
     """Muestra la información de un libro de forma atractiva."""
@@ -18,6 +31,7 @@ def display_book(book: dict, with_image: bool = True):
         console.print("[red]No se encontró información del libro.[/red]")
         return
     
+    from rich.panel import Panel
     info_panel = Panel(
         f"[bold]Autor:[/bold] {book.get('author')}\n"
         f"[bold]País:[/bold] {book.get('country')}\n"
@@ -49,19 +63,21 @@ def display_image(image_link_path: Optional[str]):
     
     try:
         console.print("Cargando imagen de portada...")
+        from term_image.image import from_file
         image = from_file(image_path, width=70)
         image.draw()
     except Exception as e:
         console.print("[red]No se pudo mostrar la imagen. Es posible que tu terminal no sea compatible.[/red]")
         console.print(f"[red]Error: {e}[/red]")
 
-def display_book_list(books: list):
+def display_book_list(books: list, title: str = "Lista de Libros"):
     """Muestra una lista de libros en una tabla."""
     if not books:
         console.print("[yellow]No se encontraron libros.[/yellow]")
         return
         
-    table = Table(title="Lista de Libros", show_header=True, header_style="bold magenta")
+    from rich.table import Table
+    table = Table(title=title, show_header=True, header_style="bold magenta")
     table.add_column("Título", style="cyan", no_wrap=True)
     table.add_column("Autor", style="green")
     table.add_column("Año", justify="right")
@@ -70,4 +86,69 @@ def display_book_list(books: list):
     for book in books:
         table.add_row(book['title'], book['author'], str(book['year']), str(book['pages']))
     
-    console.print(table)
\ No newline at end of file
+    console.print(table)
+
+def browse_book_list(
+    fetch_page: Callable[[int, int], Optional[Tuple[int, list]]],
+    title: str = "Lista de Libros",
+    show_book: Callable[[dict], None] = display_book,
+):
+    """
+    Vista paginada de una lista de libros. Solo se piden a la API y se dibujan
+    las filas de la página visible, así que el coste no depende del tamaño del
+    catálogo. `fetch_page(offset, limit)` devuelve (total, libros) o None si
+    hubo un error. Desde la lista se puede abrir el detalle de cualquier libro,
+    que se muestra con `show_book`.
+    """
+    import questionary
+
+    # Deja sitio para el título, la cabecera de la tabla y el menú de navegación.
+    page_size = max(MIN_PAGE_SIZE, console.size.height - 14)
+    pages = OrderedDict()  # Páginas ya descargadas, de la menos a la más recientemente vista
+    page = 0
+
+    while True:
+        if page in pages:
+            pages.move_to_end(page)
+        else:
+            result = fetch_page(page * page_size, page_size)
+            if result is None:
+                return
+            pages[page] = result
+            if len(pages) > MAX_CACHED_PAGES:
+                pages.popitem(last=False)
+        total, books = pages[page]
+        if total == 0:
+            console.print("[yellow]No se encontraron libros.[/yellow]")
+            return
+
+        page_count = (total + page_size - 1) // page_size
+        display_book_list(books, title=f"{title} — página {page + 1}/{page_count} ({total} libros)")
+
+        choices = [questionary.Choice(f"📖 {book['title']}", value=book) for book in books]
+        choices.append(questionary.Separator())
+        if page + 1 < page_count:
+            choices.append(questionary.Choice("Página siguiente ▶", value="next"))
+        if page > 0:
+            choices.append(questionary.Choice("◀ Página anterior", value="previous"))
+        if page_count > 1:
+            choices.append(questionary.Choice("Ir a la página...", value="goto"))
+        choices.append(questionary.Choice("Volver", value="back"))
+
+        action = questionary.select("Elige un libro para ver su detalle o navega por las páginas:", choices=choices).ask()
+        if action is None or action == "back":
+            return
+        if action == "next":
+            page += 1
+        elif action == "previous":
+            page -= 1
+        elif action == "goto":
+            target = questionary.text(
+                f"Número de página (1-{page_count}):",
+                validate=lambda t: t.isdigit() and 1 <= int(t) <= page_count,
+            ).ask()
+            if target:
+                page = int(target) - 1
+        else:
+            show_book(action)
+            questionary.press_any_key_to_continue().ask()
\ No newline at end of file
@@ -1,34 +1,81 @@
 # book_app/cli/menu.py
 
-import questionary
-import httpx
-from rich.console import Console
-from rich.panel import Panel
+# Los módulos pesados (questionary, httpx, rich, term_image, el descargador)
+# se importan dentro de las funciones que los usan para que el menú aparezca
+# cuanto antes. Ver `python -m cli.menu --startup-report`.
+from cli import startup
 import getpass
+import sys
+import threading
 from typing import Optional
 import time 
 
-from utils.downloader import check_and_download_data
-from utils.auth import register_user
-from cli.display import display_book, display_book_list
+from cli.display import console, display_book, display_book_list, browse_book_list
 
 # --- Configuración ---
 API_BASE_URL = "http://127.0.0.1:8000"
-console = Console()
-client = httpx.Client(base_url=API_BASE_URL, timeout=10.0)
+SIMILAR_BOOKS_K = 5
+# Títulos por petición a /books/lookup; no debe superar MAX_LOOKUP_TITLES de la API.
+LOOKUP_BATCH_SIZE = 1000
+_client = None
 
 # --- Estado de Sesión ---
 current_user: Optional[str] = None
 current_password: Optional[str] = None
 
+# --- Verificación de Datos en Segundo Plano ---
+# Estados posibles: "pending", "ready" o "error".
+data_status = "pending"
+_data_thread: Optional[threading.Thread] = None
+
+def _run_data_check():
+    """Comprueba y descarga los datos iniciales sin escribir en la terminal."""
+    global data_status
+    try:
+        from utils.downloader import check_and_download_data
+        data_status = "ready" if check_and_download_data(quiet=True) else "error"
+    except Exception:
+        data_status = "error"
+
+def start_data_check():
+    """
+    Lanza la verificación de datos en un hilo para no bloquear el primer menú.
+    El hilo no es daemon: al salir se espera a que termine (ver `wait_for_data`).
+    """
+    global _data_thread
+    _data_thread = threading.Thread(target=_run_data_check, name="data-check")
+    _data_thread.start()
+
+def data_status_label() -> str:
+    """Indicador del estado de la verificación de datos para mostrar en el menú."""
+    if data_status == "ready":
+        return "[green]✔️  Datos listos[/green]"
+    if data_status == "error":
+        return "[red]❌ No se pudieron obtener los datos (revisa logs/app.log)[/red]"
+    return "[yellow]⏳ Verificando datos en segundo plano...[/yellow]"
+
+def wait_for_data(message: str = "Esperando la descarga de datos..."):
+    """Espera a que termine la verificación de datos (p. ej. antes de mostrar portadas)."""
+    if _data_thread is not None and _data_thread.is_alive():
+        with console.status(message):
+            _data_thread.join()
+
 # --- Funciones de Interacción con la API ---
 
+def get_client():
+    """Devuelve el cliente HTTP, creándolo (e importando httpx) en el primer uso."""
+    global _client
+    if _client is None:
+        import httpx
+        _client = httpx.Client(base_url=API_BASE_URL, timeout=10.0)
+    return _client
+
 def get_auth():
     if current_user and current_password:
         return (current_user, current_password)
     return None
 
-def handle_api_error(response: httpx.Response):
+def handle_api_error(response):
     """Maneja errores de la API de forma centralizada."""
     if response.status_code >= 400:
         try:
@@ -39,26 +86,115 @@ def handle_api_error(response: httpx.Response):
         return True
     return False
 
+def fetch_books_page(**filters):
+    """
+    Devuelve una función que pide a la API una página de libros con los
+    filtros dados, para usar con `browse_book_list`.
+    """
+    def fetch(offset: int, limit: int):
+        response = get_client().get("/books/filter", params={**filters, "offset": offset, "limit": limit})
+        if handle_api_error(response):
+            return None
+        data = response.json()
+        return data["count"], data["books"]
+    return fetch
+
+def show_book_with_similar(book: dict):
+    """Muestra un libro y ofrece recomendaciones de libros parecidos."""
+    import questionary
+    while book:
+        # La portada puede estar descargándose aún (también al llegar desde un listado).
+        wait_for_data()
+        display_book(book)
+        if not questionary.confirm("¿Quieres ver libros similares?", default=False).ask():
+            return
+        response = get_client().get(f"/books/{book['title']}/similar", params={"k": SIMILAR_BOOKS_K})
+        if handle_api_error(response):
+            return
+        similar = response.json()["similar"]
+        if not similar:
+            console.print("[yellow]No hay otros libros con los que comparar.[/yellow]")
+            return
+        display_book_list(similar, title=f"Libros similares a {book['title']}")
+        choices = [questionary.Choice(similar_book["title"], value=similar_book) for similar_book in similar]
+        choices.append(questionary.Choice("Volver", value=None))
+        book = questionary.select("Elige un libro para ver su detalle:", choices=choices).ask()
+
 def cli_list_books():
+    import httpx
     try:
-        response = client.get("/books")
-        if not handle_api_error(response):
-            display_book_list(response.json())
+        browse_book_list(fetch_books_page(), show_book=show_book_with_similar)
     except httpx.ConnectError:
         console.print("[bold red]Error de conexión:[/bold red] No se pudo conectar a la API. ¿El servidor `uvicorn` está en ejecución?")
 
 def cli_get_book():
+    import questionary
+    import httpx
     title = questionary.text("Introduce el título del libro a buscar:").ask()
     if not title: 
         return
     try:
-        response = client.get(f"/books/title/{title}")
+        response = get_client().get(f"/books/title/{title}")
         if not handle_api_error(response):
-            display_book(response.json())
+            show_book_with_similar(response.json())
+    except httpx.ConnectError:
+        console.print("[bold red]Error de conexión con la API.[/bold red]")
+
+def cli_lookup_books():
+    import questionary
+    import httpx
+    source = questionary.select(
+        "¿Cómo quieres indicar los títulos?",
+        choices=["Pegar una lista (un título por línea)", "Leer de un archivo de texto", "Cancelar"]
+    ).ask()
+    if source == "Pegar una lista (un título por línea)":
+        text = questionary.text("Pega los títulos (Esc + Enter para terminar):", multiline=True).ask()
+    elif source == "Leer de un archivo de texto":
+        path = questionary.path("Ruta del archivo (un título por línea):").ask()
+        if not path:
+            return
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+        except OSError as e:
+            console.print(f"[red]No se pudo leer el archivo: {e}[/red]")
+            return
+    else:
+        return
+
+    # Repetidos fuera (sin distinguir mayúsculas, como la API) para que los lotes no se solapen.
+    unique = {}
+    for line in (text or "").splitlines():
+        if line.strip():
+            unique.setdefault(line.strip().lower(), line.strip())
+    titles = list(unique.values())
+    if not titles:
+        console.print("[yellow]No se indicó ningún título.[/yellow]")
+        return
+    try:
+        # Las listas largas se envían por lotes y se combinan los resultados.
+        data = {"found": [], "missing": []}
+        for start in range(0, len(titles), LOOKUP_BATCH_SIZE):
+            response = get_client().post("/books/lookup", json={"titles": titles[start:start + LOOKUP_BATCH_SIZE]})
+            if handle_api_error(response):
+                return
+            batch = response.json()
+            data["found"].extend(batch["found"])
+            data["missing"].extend(batch["missing"])
+        console.print(f"Se encontraron [bold cyan]{len(data['found'])}[/bold cyan] de {len(titles)} títulos.")
+        if data["missing"]:
+            console.print("[yellow]No encontrados:[/yellow] " + ", ".join(data["missing"]))
+        if not data["found"]:
+            return
+        # Los encontrados pueden ser miles: se recorren por páginas, como el catálogo.
+        found = data["found"]
+        browse_book_list(lambda offset, limit: (len(found), found[offset:offset + limit]), title="Libros encontrados", show_book=show_book_with_similar)
     except httpx.ConnectError:
         console.print("[bold red]Error de conexión con la API.[/bold red]")
 
 def cli_add_book():
+    import questionary
+    import httpx
     auth = get_auth()
     if not auth:
         console.print("[yellow]Debes iniciar sesión para añadir un libro.[/yellow]")
@@ -74,7 +210,7 @@ def cli_add_book():
         "link": questionary.text("Enlace a Wikipedia:").ask(),
     }
     try:
-        response = client.post("/books", json=book_data, auth=auth)
+        response = get_client().post("/books", json=book_data, auth=auth)
         if not handle_api_error(response):
             console.print(f"[green]Libro '{book_data['title']}' añadido con éxito.[/green]")
             display_book(response.json(), with_image=False)
@@ -82,6 +218,8 @@ def cli_add_book():
         console.print("[bold red]Error de conexión con la API.[/bold red]")
 
 def cli_delete_book():
+    import questionary
+    import httpx
     auth = get_auth()
     if not auth:
         console.print("[yellow]Debes iniciar sesión para eliminar un libro.[/yellow]")
@@ -91,13 +229,15 @@ def cli_delete_book():
         return
     if questionary.confirm(f"¿Estás seguro de que quieres eliminar '{title}'?").ask():
         try:
-            response = client.delete(f"/books/{title}", auth=auth)
+            response = get_client().delete(f"/books/{title}", auth=auth)
             if not handle_api_error(response):
                 console.print(f"[green]Libro '{title}' eliminado con éxito.[/green]")
         except httpx.ConnectError:
             console.print("[bold red]Error de conexión con la API.[/bold red]")
 
 def cli_update_book():
+    import questionary
+    import httpx
     auth = get_auth()
     if not auth:
         console.print("[yellow]Debes iniciar sesión para actualizar un libro.[/yellow]")
@@ -116,7 +256,7 @@ def cli_update_book():
         console.print("[yellow]No se proporcionaron datos para actualizar.[/yellow]")
         return
     try:
-        response = client.put(f"/books/{title}", json=update_payload, auth=auth)
+        response = get_client().put(f"/books/{title}", json=update_payload, auth=auth)
         if not handle_api_error(response):
             console.print(f"[green]Libro '{title}' actualizado con éxito.[/green]")
             display_book(response.json(), with_image=False)
@@ -124,25 +264,24 @@ def cli_update_book():
         console.print("[bold red]Error de conexión con la API.[/bold red]")
 
 def cli_get_by_country():
+    import questionary
+    import httpx
     country = questionary.text("Introduce el país:").ask()
     if not country: 
         return
     try:
-        response = client.get(f"/books/country/{country}")
-        if not handle_api_error(response):
-            data = response.json()
-            console.print(f"Se encontraron [bold cyan]{data['count']}[/bold cyan] libros de [bold green]{data['country']}[/bold green].")
-            if data['count'] > 0:
-                display_book_list(data['books'])
+        browse_book_list(fetch_books_page(country=country), title=f"Libros de {country}", show_book=show_book_with_similar)
     except httpx.ConnectError:
         console.print("[bold red]Error de conexión con la API.[/bold red]")
 
 def cli_suggest_by_pages():
+    import questionary
+    import httpx
     pages_str = questionary.text("Introduce un número de páginas para buscar sugerencias:", validate=lambda t: t.isdigit()).ask()
     if not pages_str: 
         return
     try:
-        response = client.get(f"/books/suggest/pages/{int(pages_str)}")
+        response = get_client().get(f"/books/suggest/pages/{int(pages_str)}")
         if not handle_api_error(response):
             data = response.json()
             suggestions = data.get("suggestions", [])
@@ -151,7 +290,7 @@ def cli_suggest_by_pages():
                 console.print("[yellow]No se encontraron sugerencias cercanas.[/yellow]")
                 return
             if len(suggestions) == 1:
-                display_book(suggestions[0])
+                show_book_with_similar(suggestions[0])
             else:
                 choices = [f"{book['title']} ({book['pages']} páginas)" for book in suggestions]
                 chosen_title_str = questionary.select(
@@ -162,7 +301,7 @@ def cli_suggest_by_pages():
                     chosen_title = chosen_title_str.split(' (')[0]
                     chosen_book = next((book for book in suggestions if book['title'] == chosen_title), None)
                     if chosen_book:
-                        display_book(chosen_book)
+                        show_book_with_similar(chosen_book)
     except httpx.ConnectError:
         console.print("[bold red]Error de conexión con la API.[/bold red]")
 
@@ -171,6 +310,7 @@ def cli_suggest_by_pages():
 
 def auth_menu():
     global current_user, current_password
+    import questionary
     choice = questionary.select(
         "Bienvenido a Book App. Por favor, inicia sesión o regístrate.",
         choices=["Iniciar Sesión", "Registrarse", "Salir"]
@@ -198,6 +338,7 @@ def auth_menu():
             return auth_menu() # Vuelve al menú si se cancela
         email = questionary.text("Email:").ask()
         password = getpass.getpass("Contraseña: ")
+        from utils.auth import register_user
         if register_user(username, email, password):
             console.print("[green]Usuario registrado con éxito. Ahora puedes iniciar sesión.[/green]")
         else:
@@ -208,14 +349,17 @@ def auth_menu():
         return False
 
 def main_menu():
+    import questionary
     is_authenticated = current_user is not None
     if is_authenticated:
         console.print(f"Menú Principal (Sesión iniciada como: [bold cyan]{current_user}[/bold cyan])")
     else:
         console.print("[yellow]Menú Principal (Invitado)[/yellow]")
+    console.print(data_status_label())
     choices = [
         "Listar todos los libros",
         "Buscar un libro por título",
+        "Buscar varios libros por título",
         "Buscar libros por país",
         "Sugerir libro por n° de páginas",
         "--- Acciones de Administrador ---",
@@ -234,10 +378,16 @@ def main_menu():
     if action is None or action == "Salir":
         return False # Termina el bucle
 
+    # Las portadas se descargan en segundo plano; esperamos antes de mostrarlas.
+    if action in ["Buscar un libro por título", "Buscar varios libros por título", "Sugerir libro por n° de páginas"]:
+        wait_for_data()
+
     if action == "Listar todos los libros": 
         cli_list_books()
     elif action == "Buscar un libro por título": 
         cli_get_book()
+    elif action == "Buscar varios libros por título": 
+        cli_lookup_books()
     elif action == "Buscar libros por país": 
         cli_get_by_country()
     elif action == "Sugerir libro por n° de páginas": 
@@ -252,7 +402,7 @@ def main_menu():
     # Pausa para que el usuario pueda leer la salida, con lógica especial para imágenes.
     
     # Acciones que pueden mostrar una imagen y necesitan una pausa para el renderizado.
-    if action in ["Buscar un libro por título", "Sugerir libro por n° de páginas"]:
+    if action in ["Buscar un libro por título", "Buscar varios libros por título", "Sugerir libro por n° de páginas"]:
         try:
             # Esta pausa da tiempo a la terminal para dibujar la imagen.
             time.sleep(0.1)
@@ -260,20 +410,27 @@ def main_menu():
             pass # Si el usuario pulsa Ctrl+C, simplemente continuamos.
         questionary.press_any_key_to_continue().ask()
 
-    # Acciones que muestran tablas largas y también se benefician de una pausa.
-    elif action in ["Listar todos los libros", "Buscar libros por país"]:
-        questionary.press_any_key_to_continue().ask()
-    
-
     return True
 
 if __name__ == "__main__":
+    startup.mark("Módulos de arranque importados")
+    from rich.panel import Panel
     console.print(Panel("📚 Book App Manager 📚", style="bold blue", expand=False))
+    startup.mark("Banner mostrado")
     
-    check_and_download_data()
+    # El informe de arranque no lanza la verificación de datos: terminaría
+    # enseguida y dejaría la descarga a medias.
+    if "--startup-report" in sys.argv:
+        import questionary
+        startup.mark("questionary importado (primer menú listo)")
+        sys.exit(0 if startup.report() else 1)
+
+    start_data_check()
+    startup.mark("Verificación de datos lanzada en segundo plano")
 
     if auth_menu():
         while main_menu():
             pass
     
+    wait_for_data("Terminando la descarga de datos antes de salir...")
     console.print("¡Hasta luego!")
\ No newline at end of file
@@ -0,0 +1,43 @@
+# book_app/cli/startup.py
+
+import os
+import time
+from typing import List, Tuple
+
+# Presupuesto de arranque en frío: tiempo máximo hasta que el primer menú está listo.
+STARTUP_BUDGET_MS = float(os.environ.get("BOOKAPP_STARTUP_BUDGET_MS", "300"))
+
+# El reloj empieza al importar este módulo, que es lo primero que hace `cli.menu`.
+_start = time.perf_counter()
+_marks: List[Tuple[str, float]] = []
+
+def mark(label: str) -> float:
+    """Registra un hito del arranque y devuelve los milisegundos transcurridos."""
+    elapsed_ms = (time.perf_counter() - _start) * 1000
+    _marks.append((label, elapsed_ms))
+    return elapsed_ms
+
+def elapsed_ms() -> float:
+    """Milisegundos transcurridos desde el inicio del arranque."""
+    return (time.perf_counter() - _start) * 1000
+
+def report() -> bool:
+    """
+    Imprime el informe de tiempos de arranque y lo registra en el log.
+    Retorna True si el arranque quedó dentro de STARTUP_BUDGET_MS.
+    """
+    from utils.logger import log_operation
+
+    total_ms = _marks[-1][1] if _marks else elapsed_ms()
+    within_budget = total_ms <= STARTUP_BUDGET_MS
+
+    print("--- Tiempos de Arranque ---")
+    previous_ms = 0.0
+    for label, at_ms in _marks:
+        print(f"{at_ms:8.1f} ms  (+{at_ms - previous_ms:6.1f} ms)  {label}")
+        previous_ms = at_ms
+    verdict = "✔️  dentro del presupuesto" if within_budget else "⚠️  fuera del presupuesto"
+    print(f"Total: {total_ms:.1f} ms / {STARTUP_BUDGET_MS:.0f} ms — {verdict}")
+
+    log_operation("SYSTEM", "CLI_STARTUP", "N/A", f"{total_ms:.1f} ms (budget {STARTUP_BUDGET_MS:.0f} ms)")
+    return within_budget
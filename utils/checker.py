@@ -25,14 +25,29 @@ def update_metadata(key, value):
     with open(METADATA_FILE, "w") as f:
         json.dump(metadata, f, indent=4)
 
+def all_images_exist():
+    """Verifica que exista la portada de cada libro de books.json."""
+    if not os.path.exists(IMAGES_DIR):
+        return False
+    try:
+        with open(BOOKS_FILE, "r", encoding="utf-8") as f:
+            books = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return False
+    existing = set(os.listdir(IMAGES_DIR))
+    return all(
+        os.path.basename(book["imageLink"]) in existing
+        for book in books if book.get("imageLink")
+    )
+
 def check_data_exists():
     """
-    Verifica si los archivos de datos (JSON y al menos una imagen) existen.
+    Verifica si los archivos de datos (JSON y todas las portadas) existen.
     Retorna un diccionario con el estado.
     """
     metadata = get_metadata()
     books_exist = os.path.exists(BOOKS_FILE)
-    images_dir_exists = os.path.exists(IMAGES_DIR) and len(os.listdir(IMAGES_DIR)) > 0
+    images_dir_exists = books_exist and all_images_exist()
 
     # Actualiza metadatos si los archivos existen pero no estaban registrados
     if books_exist and not metadata.get("books_json_downloaded"):
@@ -15,7 +15,12 @@ IMAGES_DIR = os.path.join(DATA_DIR, "images")
 BOOKS_URL = "https://raw.githubusercontent.com/benoitvallon/100-best-books/master/books.json"
 IMAGE_URL_PREFIX = "https://raw.githubusercontent.com/benoitvallon/100-best-books/master/static/"
 
-def download_file(url, dest_path, progress, task):
+def _echo(message, quiet=False):
+    """Imprime un mensaje salvo en modo silencioso (verificación en segundo plano)."""
+    if not quiet:
+        print(message)
+
+def download_file(url, dest_path, progress, task, quiet=False):
     """Descarga un único archivo con barra de progreso."""
     try:
         response = requests.get(url, stream=True)
@@ -23,19 +28,23 @@ def download_file(url, dest_path, progress, task):
         total_size = int(response.headers.get('content-length', 0))
         progress.update(task, total=total_size)
         
-        with open(dest_path, 'wb') as f:
+        # Se descarga a un archivo temporal y se mueve al final, para no dejar
+        # nunca un archivo a medias en su ruta definitiva.
+        tmp_path = dest_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
             for chunk in response.iter_content(chunk_size=1024):
                 f.write(chunk)
                 progress.update(task, advance=len(chunk))
+        os.replace(tmp_path, dest_path)
         return True
     except requests.RequestException as e:
-        print(f"Error descargando {url}: {e}")
+        _echo(f"Error descargando {url}: {e}", quiet)
         log_operation("SYSTEM", "DOWNLOAD_ERROR", url, str(e))
         return False
 
-def download_books_json():
+def download_books_json(quiet=False):
     """Descarga el archivo books.json."""
-    print("Descargando la base de datos de libros (books.json)...")
+    _echo("Descargando la base de datos de libros (books.json)...", quiet)
     if not os.path.exists(DATA_DIR):
         os.makedirs(DATA_DIR)
         
@@ -44,14 +53,15 @@ def download_books_json():
         BarColumn(bar_width=None),
         "[progress.percentage]{task.percentage:>3.1f}%",
         TimeRemainingColumn(),
+        disable=quiet,
     ) as progress:
         task = progress.add_task("books.json", total=None)
-        if download_file(BOOKS_URL, BOOKS_FILE, progress, task):
+        if download_file(BOOKS_URL, BOOKS_FILE, progress, task, quiet):
             update_metadata("books_json_downloaded", True)
             log_operation("SYSTEM", "DOWNLOAD_JSON", "books.json", "Success")
-            print("✅ 'books.json' descargado con éxito.")
+            _echo("✅ 'books.json' descargado con éxito.", quiet)
             return True
-    print("❌ No se pudo descargar 'books.json'.")
+    _echo("❌ No se pudo descargar 'books.json'.", quiet)
     return False
 
 
@@ -74,18 +84,20 @@ def download_image(book, progress, task):
     try:
         response = requests.get(image_url)
         response.raise_for_status()
-        with open(dest_path, 'wb') as f:
+        tmp_path = dest_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
             f.write(response.content)
+        os.replace(tmp_path, dest_path)
         progress.update(task, advance=1)
         return True, "Downloaded"
     except requests.RequestException:
         progress.update(task, advance=1)
         return False, "Download failed"
 
-def download_all_images():
+def download_all_images(quiet=False):
     """Descarga todas las imágenes de los libros si no existen."""
     if not os.path.exists(BOOKS_FILE):
-        print("❌ 'books.json' no encontrado. Descárgalo primero.")
+        _echo("❌ 'books.json' no encontrado. Descárgalo primero.", quiet)
         return False
         
     if not os.path.exists(IMAGES_DIR):
@@ -94,35 +106,43 @@ def download_all_images():
     with open(BOOKS_FILE, "r", encoding="utf-8") as f:
         books = json.load(f)
     
-    print(f"Verificando y descargando {len(books)} imágenes de portadas...")
-    with Progress() as progress:
+    _echo(f"Verificando y descargando {len(books)} imágenes de portadas...", quiet)
+    with Progress(disable=quiet) as progress:
         task = progress.add_task("[green]Descargando imágenes...", total=len(books))
         with ThreadPoolExecutor(max_workers=10) as executor:
             list(executor.map(lambda book: download_image(book, progress, task), books))
 
     update_metadata("images_downloaded", True)
     log_operation("SYSTEM", "DOWNLOAD_IMAGES", "All images", "Success")
-    print("✅ Proceso de descarga de imágenes finalizado.")
+    _echo("✅ Proceso de descarga de imágenes finalizado.", quiet)
     return True
 
-def check_and_download_data():
-    """Función principal que comprueba y descarga todos los datos necesarios."""
+def check_and_download_data(quiet=False):
+    """
+    Función principal que comprueba y descarga todos los datos necesarios.
+
+    En modo silencioso no imprime nada ni termina el programa si falla la
+    descarga de `books.json`; devuelve False para que el llamador lo informe.
+    """
     from .checker import check_data_exists # Importación local para evitar ciclo
     
-    print("--- Verificación de Datos Iniciales ---")
+    _echo("--- Verificación de Datos Iniciales ---", quiet)
     status = check_data_exists()
     
     if not status["books_json"]:
-        print("⚠️  'books.json' no encontrado.")
-        if not download_books_json():
+        _echo("⚠️  'books.json' no encontrado.", quiet)
+        if not download_books_json(quiet):
+             if quiet:
+                 return False
              print("🚨 Error crítico: No se pudo obtener la base de datos. El programa no puede continuar.")
              exit()
     else:
-        print("✔️  'books.json' ya existe.")
+        _echo("✔️  'books.json' ya existe.", quiet)
 
     if not status["images"]:
-        print("⚠️  Imágenes de portadas no encontradas.")
-        download_all_images()
+        _echo("⚠️  Imágenes de portadas no encontradas.", quiet)
+        download_all_images(quiet)
     else:
-        print("✔️  El directorio de imágenes ya existe.")
-    print("--- Verificación Finalizada --- \n")
\ No newline at end of file
+        _echo("✔️  El directorio de imágenes ya existe.", quiet)
+    _echo("--- Verificación Finalizada --- \n", quiet)
+    return True
\ No newline at end of file